@@ -1,135 +1,556 @@
+import asyncio
 import azure.functions as func
+import base64
+import collections
+import contextlib
+import csv
 import datetime
+import functools
+import io
+import itertools
 import json
 import logging
+import math
 import os
+import re
 import tempfile
-import textwrap
-from typing import List, Dict, Any
-import pandas as pd
-from io import BytesIO
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Set, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+import xlsxwriter
+from xlsxwriter.format import Format
+from xlsxwriter.worksheet import Worksheet
+from urllib3.util.retry import Retry
+from azure.core.pipeline.transport import RequestsTransport
 from azure.storage.blob import BlobServiceClient, ContainerClient, BlobClient
 
 app = func.FunctionApp()
 
-def download_csv_files_from_blob(connection_string: str, container_name: str) -> Dict[str, pd.DataFrame]:
+# Number of blobs downloaded ahead of the sheet being written, and the number of
+# parallel ranged GETs the SDK may use for each individual blob.
+DOWNLOAD_PREFETCH = 4
+BLOB_MAX_CONCURRENCY = 8
+BLOB_CONNECTION_TIMEOUT = 60
+
+# Size of the HTTP connection pool; must cover the parallel downloads and uploads
+# or the extra connections are opened and thrown away on every request.
+CONNECTION_POOL_SIZE = 64
+
+# Largest blob fetched with the initial GET, and the range size used for the rest.
+BLOB_MAX_SINGLE_GET_SIZE = 32 * 1024 * 1024
+BLOB_MAX_CHUNK_GET_SIZE = 8 * 1024 * 1024
+
+# Size of each block staged while the workbook is being written, the number of
+# blocks uploaded in parallel, and how many more written blocks may wait for a
+# free upload thread before the workbook writer is blocked.
+UPLOAD_BLOCK_SIZE = 4 * 1024 * 1024
+UPLOAD_MAX_CONCURRENCY = 8
+UPLOAD_QUEUE_DEPTH = 4
+
+# Size of an Excel worksheet, including the header row.
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_COLUMNS = 16_384
+
+# CSV fields written as numbers and booleans; anything else is written as text.
+# The number pattern is plain ASCII decimal notation with optional surrounding spaces,
+# as pd.read_csv accepts, unlike float() which also accepts underscores, 'nan',
+# 'infinity' and non-ASCII digits. The booleans are pd.read_csv's default spellings.
+NUMBER_PATTERN = re.compile(r"[ \t]*[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?[ \t]*")
+BOOLEAN_VALUES = {
+    'True': True, 'TRUE': True, 'true': True,
+    'False': False, 'FALSE': False, 'false': False,
+}
+
+# csv.reader rejects fields over 128 KiB by default; pd.read_csv has no such limit.
+# Excel cuts text cells at 32,767 characters anyway, but a long field must not fail the file.
+CSV_FIELD_SIZE_LIMIT = 2 ** 31 - 1
+csv.field_size_limit(CSV_FIELD_SIZE_LIMIT)
+
+class BlobBuffer(io.RawIOBase):
+    """
+    Seekable, readable and writable file object over a preallocated bytearray. The blob
+    SDK's parallel readinto() writes each ranged GET at its own offset, so the blob lands
+    in a single exactly-sized buffer instead of a BytesIO that grows and copies. The CSV
+    reader then reads it back in place, and closing the file frees the buffer.
+    """
+    
+    def __init__(self, size: int):
+        self.data = bytearray(size)
+        self._view = memoryview(self.data)
+        self._position = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def writable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = offset
+        return self._position
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def truncate(self, size: int = None) -> int:
+        # Only shrinks the readable length; the buffer itself is never reallocated
+        if size is None:
+            size = self._position
+        self._view = self._view[:size]
+        return size
+    
+    def readinto(self, buffer) -> int:
+        size = max(0, min(len(buffer), len(self._view) - self._position))
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+    
+    def write(self, data) -> int:
+        size = len(data)
+        self._view[self._position:self._position + size] = data
+        self._position += size
+        return size
+    
+    def close(self) -> None:
+        # Drop the bytes as soon as the sheet is written rather than when the
+        # whole workbook is done
+        self._view.release()
+        self.data = bytearray()
+        super().close()
+
+class BlockBlobWriter(io.RawIOBase):
+    """
+    Write-only file object that uploads to a block blob while it is being written.
+    Every UPLOAD_BLOCK_SIZE bytes are staged as a block on a small thread pool, so
+    several blocks upload in parallel, and close() commits the block list. Used as
+    the xlsxwriter output so the upload overlaps with building the workbook and the
+    file is never held in memory whole. When used as a context manager, the block
+    list is not committed if the block raised, leaving any existing blob untouched.
+    """
+    
+    def __init__(self, blob_client: BlobClient):
+        self.blob_client = blob_client
+        self._pending = bytearray()
+        self._block_ids = []
+        # Uncommitted blocks belong to the blob name, so two requests writing the same
+        # file would overwrite each other's blocks without a per-writer prefix
+        self._block_id_prefix = uuid.uuid4().hex
+        self._error = None
+        self._stager = ThreadPoolExecutor(max_workers=UPLOAD_MAX_CONCURRENCY)
+        # Blocks being staged plus blocks waiting for a free stager thread
+        self._blocks_in_flight = threading.Semaphore(UPLOAD_MAX_CONCURRENCY + UPLOAD_QUEUE_DEPTH)
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        if self._error is not None:
+            raise self._error
+        self._pending += data
+        while len(self._pending) >= UPLOAD_BLOCK_SIZE:
+            self._put_block(bytes(self._pending[:UPLOAD_BLOCK_SIZE]))
+            del self._pending[:UPLOAD_BLOCK_SIZE]
+        return len(data)
+    
+    def _put_block(self, block: bytes) -> None:
+        # Block ids must all have the same length within a blob; the committed
+        # block list gives the order, so blocks may be staged in any order
+        block_id = base64.b64encode(f"{self._block_id_prefix}{len(self._block_ids):08d}".encode()).decode()
+        self._block_ids.append(block_id)
+        self._blocks_in_flight.acquire()
+        self._stager.submit(self._stage_block, block_id, block)
+    
+    def _stage_block(self, block_id: str, block: bytes) -> None:
+        try:
+            if self._error is None:
+                self.blob_client.stage_block(block_id, block)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._blocks_in_flight.release()
+    
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self._pending:
+            self._put_block(bytes(self._pending))
+            self._pending.clear()
+        self._stager.shutdown(wait=True)
+        super().close()
+        if self._error is not None:
+            raise self._error
+        self.blob_client.commit_block_list(self._block_ids)
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        elif not self.closed:
+            self._stager.shutdown(wait=True, cancel_futures=True)
+            super().close()
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter with the retry settings azure-core gives its own sessions (no urllib3
+    retries or redirects, since the SDK pipeline handles those), and a connection pool
+    of CONNECTION_POOL_SIZE instead of requests' default of 10.
+    """
+    
+    def __init__(self):
+        super().__init__(
+            pool_connections=CONNECTION_POOL_SIZE,
+            pool_maxsize=CONNECTION_POOL_SIZE,
+            max_retries=Retry(total=False, redirect=False, raise_on_status=False),
+        )
+
+def create_blob_transport() -> RequestsTransport:
+    """
+    Create an HTTP transport whose connection pool is large enough for all the
+    parallel ranged downloads, so connections are kept alive and reused.
+    
+    Returns:
+        A RequestsTransport for use with BlobServiceClient.
+    """
+    # azure-core only sets up sessions it creates itself, so a session passed in
+    # needs the SDK's adapter settings mounted by hand
+    session = requests.Session()
+    adapter = PooledHTTPAdapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestsTransport(session=session, session_owner=True)
+
+@functools.lru_cache(maxsize=4)
+def get_blob_service_client(connection_string: str) -> BlobServiceClient:
+    """
+    Get the BlobServiceClient for a connection string, creating it on first use.
+    The client is cached so downloads and uploads, and later invocations on the same
+    worker, reuse its HTTP session instead of paying for a new TLS handshake.
+    
+    Args:
+        connection_string: The connection string for the Azure Storage account.
+        
+    Returns:
+        A BlobServiceClient for the storage account.
     """
-    Download all CSV files from the 'csvfiles' directory in the specified blob container.
+    return BlobServiceClient.from_connection_string(
+        connection_string,
+        transport=create_blob_transport(),
+        max_single_get_size=BLOB_MAX_SINGLE_GET_SIZE,
+        max_chunk_get_size=BLOB_MAX_CHUNK_GET_SIZE,
+    )
+
+def list_csv_blobs(container_client: ContainerClient) -> List[str]:
+    """
+    List all CSV files in the 'csvfiles' directory of the specified blob container.
     This is equivalent to: all_files = glob.glob(os.path.join(path, "*.csv")) in the original code,
     but instead of the local file system, we're reading from Azure Blob Storage.
     
     Args:
-        connection_string: The connection string for the Azure Storage account.
-        container_name: The name of the blob container.
+        container_client: The client for the blob container.
         
     Returns:
-        A dictionary mapping filenames to pandas DataFrames.
-    """
-    logging.info(f"Connecting to blob container {container_name}")
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-    container_client = blob_service_client.get_container_client(container_name)
-    
-    # List all blobs in the 'csvfiles' directory - this is equivalent to 
-    # glob.glob(os.path.join(path, "*.csv")) in the original code
-    csv_files = {}
-    all_files_found = []
-    
-    for blob in container_client.list_blobs(name_starts_with="csvfiles/"):
-        if blob.name.endswith('.csv'):
-            all_files_found.append(blob.name)
-            logging.info(f"Found CSV file: {blob.name}")
-            blob_client = container_client.get_blob_client(blob.name)
-            blob_data = blob_client.download_blob().readall()
-            
-            # Parse the CSV data - equivalent to df = pd.read_csv(f) in original code
-            df = pd.read_csv(BytesIO(blob_data))
-            # We use the basename to match the original code's behavior with local files
-            csv_files[os.path.basename(blob.name)] = df
+        The names of the CSV blobs, in listing order.
+    """
+    all_files_found = [
+        blob.name
+        for blob in container_client.list_blobs(name_starts_with="csvfiles/")
+        if blob.name.endswith('.csv')
+    ]
+    for name in all_files_found:
+        logging.info(f"Found CSV file: {name}")
     
     logging.info(f"Total CSV files found in csvfiles directory: {len(all_files_found)}")
-    return csv_files
+    return all_files_found
 
-def create_excel_from_csv_files(csv_files: Dict[str, pd.DataFrame], excel_filename: str) -> bytes:
+def download_csv_files_from_blob(container_client: ContainerClient, blob_names: List[str]) -> Iterator[Tuple[str, BlobBuffer]]:
     """
-    Create an Excel file with multiple sheets from the provided CSV DataFrames,
-    following the exact logic from the original csvToExcel function.
+    Download the given CSV blobs one after the other, keeping only a few downloads
+    ahead of the caller so at most DOWNLOAD_PREFETCH + 1 blobs are held in memory.
     
     Args:
-        csv_files: A dictionary mapping filenames to pandas DataFrames.
-        excel_filename: The name to give to the Excel file.
+        container_client: The client for the blob container.
+        blob_names: The names of the CSV blobs, in the order they should be returned.
+        
+    Yields:
+        Tuples of blob name and raw CSV contents, positioned at the start.
+    """
+    def download(name: str) -> BlobBuffer:
+        blob_client = container_client.get_blob_client(name)
+        downloader = blob_client.download_blob(
+            max_concurrency=BLOB_MAX_CONCURRENCY,
+            connection_timeout=BLOB_CONNECTION_TIMEOUT,
+        )
+        # Size the buffer from the downloaded blob's properties rather than the listing,
+        # which may be stale if the blob was overwritten in between
+        buffer = BlobBuffer(downloader.size)
+        buffer.truncate(downloader.readinto(buffer))
+        buffer.seek(0)
+        return buffer
+    
+    # Download the next blobs in the background while the caller writes the current
+    # one; the SDK releases the GIL during HTTP I/O. Results are handed out in listing
+    # order so the sheet order does not depend on which download finished first.
+    remaining = iter(blob_names)
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_PREFETCH) as executor:
+        pending = collections.deque(
+            (name, executor.submit(download, name))
+            for name in itertools.islice(remaining, DOWNLOAD_PREFETCH)
+        )
+        try:
+            while pending:
+                name, future = pending.popleft()
+                next_name = next(remaining, None)
+                if next_name is not None:
+                    pending.append((next_name, executor.submit(download, next_name)))
+                yield name, future.result()
+        finally:
+            # When the caller stops early, drop the downloads that have not started
+            # yet so closing only waits for the ones already in flight
+            executor.shutdown(cancel_futures=True)
+
+def write_sheet(workbook: xlsxwriter.Workbook, sheet_name: str, csv_data: BinaryIO, header_format: Format, used_sheet_names: Set[str]) -> None:
+    """
+    Add a worksheet to the workbook and copy the CSV rows into it, header first.
+    Rows are written strictly in order, as required by constant_memory mode.
+    A CSV with more rows than fit on one sheet continues on further sheets named
+    like duplicates (_2, _3, ...), each starting with the header row again.
+    
+    Args:
+        workbook: The xlsxwriter workbook to add the sheet to.
+        sheet_name: The name of the new worksheet.
+        csv_data: The raw CSV contents.
+        header_format: The format for the header row, shared by all sheets.
+        used_sheet_names: The lowercased names of all sheets in the workbook; names of
+            continuation sheets are added to it.
+    
+    Raises:
+        ValueError: If the header or any row of the CSV has more columns than an Excel
+            sheet.
+    """
+    # The CSV rows go straight to the sheet without building a DataFrame first, and
+    # write_csv_row types each cell. utf-8-sig drops a byte order mark, as pandas does.
+    with io.TextIOWrapper(csv_data, encoding='utf-8-sig', newline='') as text:
+        # filter() drops the empty lists csv.reader returns for blank lines, which
+        # pd.read_csv skipped, including blank lines before the header
+        rows = filter(None, csv.reader(text))
+        header = next(rows, [])
+        # xlsxwriter silently drops cells past the last column, so fail before writing
+        if len(header) > EXCEL_MAX_COLUMNS:
+            raise ValueError(f"{sheet_name} has {len(header)} columns, Excel allows at most {EXCEL_MAX_COLUMNS}")
+        
+        rows_per_sheet = EXCEL_MAX_ROWS - 1
+        first_sheet_name = sheet_name
+        while True:
+            worksheet = workbook.add_worksheet(sheet_name)
+            # Column names stay text even when they look like numbers
+            for col_index, name in enumerate(header):
+                worksheet.write_string(0, col_index, name, header_format)
+            
+            # Hot loop: rows are written in file order, as constant_memory cannot go
+            # back to an earlier row
+            row_index = 0
+            for row_index, row in enumerate(itertools.islice(rows, rows_per_sheet), start=1):
+                # Data rows can be wider than the header, check them too
+                if len(row) > EXCEL_MAX_COLUMNS:
+                    raise ValueError(f"{first_sheet_name} has {len(row)} columns, Excel allows at most {EXCEL_MAX_COLUMNS}")
+                write_csv_row(worksheet, row_index, row)
+            
+            # Stop unless the sheet is full and there are rows left over
+            next_row = next(rows, None) if row_index == rows_per_sheet else None
+            if next_row is None:
+                break
+            rows = itertools.chain([next_row], rows)
+            sheet_name = make_unique_sheet_name(first_sheet_name, used_sheet_names)
+            logging.info(f"Sheet is full at {EXCEL_MAX_ROWS} rows, continuing on {sheet_name}")
+
+def write_csv_row(worksheet: Worksheet, row_index: int, row: List[str]) -> None:
+    """
+    Write one CSV row, typing each cell: plain decimal numbers become numbers,
+    true/false in the spellings pd.read_csv accepts become booleans, empty fields are
+    left blank and everything else stays text. This is stricter than xlsxwriter's
+    strings_to_numbers, which uses float() and so also turns text such as 2020_01,
+    'nan' or 'infinity' into numbers.
+    
+    Args:
+        worksheet: The worksheet to write to.
+        row_index: The zero-based row to write.
+        row: The CSV fields of the row.
+    """
+    # Local bindings keep the attribute lookups out of the per-cell loop
+    is_number = NUMBER_PATTERN.fullmatch
+    write_number = worksheet.write_number
+    write_boolean = worksheet.write_boolean
+    write_string = worksheet.write_string
+    for col_index, value in enumerate(row):
+        if not value:
+            continue
+        if is_number(value):
+            number = float(value)
+            # Exponents such as 1e999 overflow to inf, which Excel cannot store
+            if not math.isinf(number):
+                write_number(row_index, col_index, number)
+                continue
+        elif value in BOOLEAN_VALUES:
+            write_boolean(row_index, col_index, BOOLEAN_VALUES[value])
+            continue
+        write_string(row_index, col_index, value)
+
+def make_unique_sheet_name(stem: str, used_sheet_names: Set[str]) -> str:
+    """
+    Cut a name to Excel's 31 character limit and add a _2, _3, ... suffix if a sheet
+    with that name (case-insensitively, like Excel) is already taken.
+    
+    Args:
+        stem: The preferred sheet name.
+        used_sheet_names: The lowercased names already taken; the new name is added to it.
         
     Returns:
-        The Excel file as bytes.
+        The unique sheet name.
     """
-    logging.info(f"Creating Excel file with {len(csv_files)} sheets")
-    xls_name = str(excel_filename)  # Just like in original code
+    sheet_name = stem[:31]
+    counter = 1
+    while sheet_name.lower() in used_sheet_names:
+        counter += 1
+        suffix = f"_{counter}"
+        sheet_name = stem[:31 - len(suffix)] + suffix
+    
+    used_sheet_names.add(sheet_name.lower())
+    return sheet_name
+
+def get_sheet_names(blob_names: Iterable[str]) -> Dict[str, str]:
+    """
+    Work out a unique sheet name for every CSV file before the workbook is opened.
+    The sheet name is the filename without directory or extension, cut to Excel's
+    31 character limit. Names that clash (case-insensitively, like Excel) get a
+    _2, _3, ... suffix in file order, instead of failing the whole workbook.
+    
+    Args:
+        blob_names: The CSV blob names, in sheet order.
+        
+    Returns:
+        A dictionary mapping each blob name to its sheet name.
+    """
+    sheet_names = {}
+    used = set()
+    logging.info('These files have a character length greater than 31:')
+    
+    for blob_name in blob_names:
+        # Use the CSV filename (without extension) as the sheet name
+        # We use the basename to match the original code's behavior with local files
+        stem = os.path.splitext(os.path.basename(blob_name))[0]
+        sheet_name = make_unique_sheet_name(stem, used)
+        if len(stem) > 31:
+            # Log the filenames with long names, followed by the name they get
+            logging.info(stem)
+            logging.info('---------------------------------------------')
+            logging.info(sheet_name)
+        
+        sheet_names[blob_name] = sheet_name
+    
+    logging.info('These tabs are now named above:  \n \n')
+    return sheet_names
+
+def create_excel_from_csv_files(blob_names: List[str], csv_files: Iterable[Tuple[str, BinaryIO]], excel_filename: str, output: BinaryIO) -> None:
+    """
+    Create an Excel file with multiple sheets from the provided CSV files,
+    following the exact logic from the original csvToExcel function.
+    Each CSV is written and released before the next one is taken from csv_files.
     
-    # Create a BytesIO object to store the Excel file
-    excel_buffer = BytesIO()
+    Args:
+        blob_names: The names of all the CSV blobs, used to name the sheets up front.
+        csv_files: Tuples of blob name and raw CSV contents, in sheet order.
+        excel_filename: The name to give to the Excel file.
+        output: The binary file object the Excel file is written to.
+    """
+    logging.info(f"Creating Excel file with {len(blob_names)} sheets")
+    xls_name = str(excel_filename)  # Just like in original code
     
     # Create Excel file with each CSV as a separate sheet
-    # Using xlsxwriter as the engine to match the original code
-    with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-        logging.info('These files have a character length greater than 33:')
+    # Using xlsxwriter directly (not pd.ExcelWriter) so constant_memory mode can be used:
+    # each row is flushed to a temp file as soon as the next one starts, which keeps
+    # memory flat per sheet. This requires writing the rows strictly in order.
+    # The temp files go in a private directory so they are removed even when the
+    # workbook is never closed because a sheet or the upload failed.
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Cells are typed by write_csv_row, so URL and formula detection, which would
+        # only add regex work per cell, are off and strings_to_numbers stays off.
+        # constant_memory already writes strings inline instead of building a shared
+        # string table, and zip64 lets a large workbook pass 4 GB instead of failing at close.
+        workbook = xlsxwriter.Workbook(output, {
+            'constant_memory': True,
+            'tmpdir': tmpdir,
+            'strings_to_urls': False,
+            'strings_to_formulas': False,
+            'use_zip64': True,
+        })
+        sheet_names = get_sheet_names(blob_names)
+        # One format object for every header cell in the workbook, styled like the
+        # header pandas' to_excel used to write; data cells use no format at all
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        
+        # Continuation sheets for CSVs that overflow a sheet must not take a name
+        # reserved for a later file
+        used_sheet_names = {name.lower() for name in sheet_names.values()}
+        
+        for blob_name, csv_data in csv_files:
+            write_sheet(workbook, sheet_names[blob_name], csv_data, header_format, used_sheet_names)
         
-        for filename, df in csv_files.items():
-            # Use the CSV filename (without extension) as the sheet name
-            sheet_name = os.path.splitext(filename)[0]
-            
-            # Check if the sheet name is within Excel's 31 character limit (exactly like original)
-            if len(sheet_name) <= 31:  # Using 31 not 33 because Excel's limit is 31
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-            else:
-                # Log the filenames with long names
-                logging.info(sheet_name)  # Same as print() in original
-                logging.info('---------------------------------------------')
-                
-                # Exactly the same logic as original code
-                others = sheet_name
-                others = textwrap.shorten(others, width=30, placeholder='')
-                df.to_excel(writer, sheet_name=others)
-                
-                logging.info(others)  # Same as print(others) in original
-        
-        logging.info('These tabs are now named above:  \n \n')
         logging.info('Job Complete!')
-    
-    # Get the bytes of the Excel file
-    excel_buffer.seek(0)
-    return excel_buffer.getvalue()
+        workbook.close()
 
-def upload_excel_to_blob(excel_data: bytes, connection_string: str, container_name: str, excel_filename: str) -> str:
+def open_excel_blob_writer(container_client: ContainerClient, excel_filename: str) -> BlockBlobWriter:
     """
-    Upload the Excel file to the specified blob container.
+    Open a writer that uploads the Excel file to the specified blob container as it is written.
     
     Args:
-        excel_data: The Excel file as bytes.
-        connection_string: The connection string for the Azure Storage account.
-        container_name: The name of the blob container.
+        container_client: The client for the blob container.
         excel_filename: The name to give to the Excel file.
         
     Returns:
-        The URL of the uploaded Excel file.
+        A BlockBlobWriter; the blob is committed when it is closed.
     """
-    logging.info(f"Uploading Excel file {excel_filename} to blob container {container_name}")
+    logging.info(f"Uploading Excel file {excel_filename} to blob container {container_client.container_name}")
     
     # Ensure the filename has .xlsx extension
     if not excel_filename.endswith('.xlsx'):
         excel_filename += '.xlsx'
     
-    # Upload the Excel file to blob storage
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-    container_client = blob_service_client.get_container_client(container_name)
-    
     # Upload to the root of the container
     blob_client = container_client.get_blob_client(excel_filename)
-    blob_client.upload_blob(excel_data, overwrite=True)
+    return BlockBlobWriter(blob_client)
+
+def convert_csv_files_to_excel(container_client: ContainerClient, blob_names: List[str], excel_filename: str) -> str:
+    """
+    Create an Excel file from the given CSV blobs, downloading them as the sheets are
+    written and uploading the Excel file to the root of the container as it is written.
     
-    # Generate a URL with SAS token for the blob
-    return blob_client.url
+    Args:
+        container_client: The client for the blob container.
+        blob_names: The names of the CSV blobs, in sheet order.
+        excel_filename: The name to give to the Excel file.
+        
+    Returns:
+        The URL of the uploaded Excel file.
+    """
+    # Close the downloads here on failure, so the prefetch pool is shut down on this
+    # worker thread rather than whenever the generator is garbage collected, which
+    # can happen on the event loop thread and block it
+    with contextlib.closing(download_csv_files_from_blob(container_client, blob_names)) as csv_files:
+        with open_excel_blob_writer(container_client, excel_filename) as excel_stream:
+            create_excel_from_csv_files(blob_names, csv_files, excel_filename, excel_stream)
+    return excel_stream.blob_client.url
 
 @app.route(route="ConvertCsvToExcel", auth_level=func.AuthLevel.FUNCTION)
-def ConvertCsvToExcel(req: func.HttpRequest) -> func.HttpResponse:
+async def ConvertCsvToExcel(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Python HTTP trigger function processed a request.')
 
     try:
@@ -148,25 +569,29 @@ def ConvertCsvToExcel(req: func.HttpRequest) -> func.HttpResponse:
             
         logging.info(f"Starting CSV to Excel conversion for: {excel_filename}")
         
-        # Download all CSV files from the blob container's csvfiles directory
+        # One container client (and HTTP session) serves both the download and the upload
+        logging.info(f"Connecting to blob container {container_name}")
+        container_client = get_blob_service_client(connection_string).get_container_client(container_name)
+        
+        # Find all CSV files in the blob container's csvfiles directory
         # This is equivalent to glob.glob(os.path.join(path, "*.csv")) in the original code
-        csv_files = download_csv_files_from_blob(connection_string, container_name)
+        # The blob and workbook work is blocking, so it runs on a worker thread and the
+        # Functions worker's event loop stays free to accept other requests
+        blob_names = await asyncio.to_thread(list_csv_blobs, container_client)
         
-        if not csv_files:
+        if not blob_names:
             return func.HttpResponse(
                 "No CSV files found in the csvfiles directory of the specified blob container.",
                 status_code=404
             )
         
-        logging.info(f"Found {len(csv_files)} CSV files to process")
+        logging.info(f"Found {len(blob_names)} CSV files to process")
             
-        # Create an Excel file from the CSV files
-        # This is equivalent to the csvToExcel function in the original code
-        excel_data = create_excel_from_csv_files(csv_files, excel_filename)
-        
-        # Upload the Excel file to blob storage
-        # This is a new step not in the original code since we're working with Azure Blob Storage
-        excel_url = upload_excel_to_blob(excel_data, connection_string, container_name, excel_filename)
+        # Create an Excel file from the CSV files, downloading them as the sheets are written
+        # and uploading it to blob storage as it is written
+        # This is equivalent to the csvToExcel function in the original code, plus the download
+        # and upload steps since we're working with Azure Blob Storage
+        excel_url = await asyncio.to_thread(convert_csv_files_to_excel, container_client, blob_names, excel_filename)
         
         # Return the URL to the Excel file
         return func.HttpResponse(
@@ -174,7 +599,7 @@ def ConvertCsvToExcel(req: func.HttpRequest) -> func.HttpResponse:
                 "status": "success", 
                 "message": "Job Complete!",
                 "excel_url": excel_url,
-                "file_count": len(csv_files)
+                "file_count": len(blob_names)
             }),
             status_code=200,
             mimetype="application/json"